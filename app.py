@@ -1,18 +1,60 @@
-from flask import Flask, request, jsonify, redirect, session, url_for
+from flask import Flask, request, jsonify, redirect, session, url_for, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+import lxml.html
+from lxml import etree
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import hashlib
+import orjson
+import functools
 import time
 import re
+import diskcache
+import requests_cache
+import aiohttp
+from rapidfuzz import fuzz
+from rapidfuzz.utils import default_process
+from redis import Redis
+from redis.exceptions import RedisError
+from rq import Queue
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
 
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize JSON responses with orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        # Pass dates and dataclasses through to Flask's default hook so they
+        # serialize as they would with the stock provider (HTTP dates, etc.)
+        option = (
+            orjson.OPT_NON_STR_KEYS |
+            orjson.OPT_PASSTHROUGH_DATETIME |
+            orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
 CORS(app)
 
@@ -21,64 +63,188 @@ SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
 SPOTIFY_REDIRECT_URI = os.getenv('SPOTIFY_REDIRECT_URI', 'http://localhost:5000/callback')
 
+# Number of concurrent Spotify searches when building a playlist
+SEARCH_CONCURRENCY = 10
+SPOTIFY_SEARCH_URL = 'https://api.spotify.com/v1/search'
+
+# Combined title + artist fuzzy score (out of 200) to accept a match outright
+MATCH_THRESHOLD = 150
+
+# Retries for rate-limited (429) Spotify requests
+MAX_RETRIES = 3
+MAX_RETRY_AFTER = 30  # Longest Retry-After we'll honour, in seconds
+
+# Server errors the HTTP layer retries itself. 429s are never retried there
+# (Retry-After is ignored at that level), so they reach retry_with_backoff
+# with Spotify's headers and the MAX_RETRY_AFTER cap applies
+SPOTIPY_RETRY_CODES = (500, 502, 503, 504)
+
+# Seconds to reuse the current user's profile in /api/status
+USER_INFO_TTL = 60
+
+# Longest /api/auth/wait will hold a request open, in seconds
+AUTH_WAIT_MAX = 60
+
+# Background playlist builds (run `rq worker playlists` alongside the app)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+PLAYLIST_JOB_TIMEOUT = 10 * 60  # 10 minutes, also how long a job may wait queued
+PLAYLIST_RESULT_TTL = 60 * 60  # 1 hour, the lifetime of a Spotify access token
+
+# Persistent cache of (title, artist) -> Spotify track lookups
+TRACK_CACHE_DIR = os.getenv('TRACK_CACHE_DIR', './.cache/spotify_tracks')
+TRACK_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days
+WEAK_MATCH_CACHE_TTL = 24 * 60 * 60  # 1 day, for matches below MATCH_THRESHOLD
+
+# HTTP cache for Billboard chart pages
+BILLBOARD_CACHE_PATH = os.getenv('BILLBOARD_CACHE_PATH', './.cache/billboard_cache')
+
+# Punctuation stripped from search terms
+_PUNCT_RE = re.compile(r'[^\w\s]')
+
+# Current Billboard layout: one list item per row with title h3 and artist span
+CHART_ITEM_XPATH = etree.XPath(
+    '//li[contains(concat(" ", normalize-space(@class), " "), " o-chart-results-list__item ")][.//h3]'
+)
+CHART_TITLE_XPATH = etree.XPath('string((.//h3)[1])')
+CHART_ARTIST_XPATH = etree.XPath(
+    'string((.//span[contains(concat(" ", normalize-space(@class), " "), " c-label ")])[1])'
+)
+
+# Older layouts: only build the parts of the page the heading selectors can match
+CHART_STRAINER = SoupStrainer(['ul', 'li', 'div', 'h3', 'p', 'span'])
+
+def _retry_delay(retry_after, attempt):
+    """Seconds to wait before retrying: Retry-After if given, else 1, 2, 4s"""
+    try:
+        return min(int(retry_after), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return 2 ** attempt
+
+def retry_with_backoff(func, *args, **kwargs):
+    """Call a spotipy method, backing off and retrying when rate limited"""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except spotipy.SpotifyException as e:
+            if e.http_status != 429 or attempt == MAX_RETRIES:
+                raise
+            retry_after = (e.headers or {}).get('Retry-After')
+            time.sleep(_retry_delay(retry_after, attempt))
+
+def _parse_chart_items(html):
+    """Parse chart rows from the current Billboard layout in one pass"""
+    songs = []
+    for item in CHART_ITEM_XPATH(lxml.html.fromstring(html)):
+        title = CHART_TITLE_XPATH(item).strip()
+        if not title or len(title) <= 1:
+            continue
+        artist = CHART_ARTIST_XPATH(item).strip() or "Unknown Artist"
+        songs.append({
+            'position': len(songs) + 1,
+            'title': title,
+            'artist': artist
+        })
+        if len(songs) == 100:
+            break
+    return songs
+
+def _parse_chart_headings(soup):
+    """Parse chart rows by walking h3 headings (older layouts)"""
+    songs = []
+    
+    # Try multiple selectors for different Billboard layouts
+    selectors = [
+        'li ul li h3',  # Old layout
+        'h3.c-title',   # New layout
+        '.chart-list__item h3',  # Alternative layout
+        '.o-chart-results-list__item h3'  # Another layout
+    ]
+    
+    song_elements = []
+    for selector in selectors:
+        song_elements = soup.select(selector)
+        if song_elements:
+            break
+    
+    if not song_elements:
+        # Fallback: look for any h3 elements
+        song_elements = soup.find_all('h3')
+    
+    for i, element in enumerate(song_elements[:100]):  # Limit to 100
+        title = element.get_text().strip()
+        if title and len(title) > 1:  # Basic validation
+            # Try to find artist info (usually in nearby elements)
+            artist = "Unknown Artist"
+            parent = element.parent
+            if parent:
+                # Look for artist in sibling elements
+                siblings = parent.find_all(['p', 'span', 'div'])
+                for sibling in siblings:
+                    text = sibling.get_text().strip()
+                    if text and text != title and len(text) < 100:
+                        artist = text
+                        break
+            
+            songs.append({
+                'position': i + 1,
+                'title': title,
+                'artist': artist
+            })
+    
+    return songs
+
+@functools.lru_cache(maxsize=64)
+def _scrape_chart(session, url, expire_after, day):
+    """Scrape and parse a Billboard Hot 100 page, memoized per day"""
+    response = session.get(url, timeout=10, expire_after=expire_after)
+    response.raise_for_status()
+    
+    songs = _parse_chart_items(response.text)
+    if not songs:
+        soup = BeautifulSoup(response.text, 'lxml', parse_only=CHART_STRAINER)
+        songs = _parse_chart_headings(soup)
+    
+    if not songs:
+        # Raise so that an empty parse isn't memoized
+        raise ValueError("No songs found on chart page")
+    
+    return tuple(songs[:100])  # Ensure we return max 100
+
 class BillboardScraper:
     def __init__(self):
         self.base_url = 'https://www.billboard.com/charts/hot-100'
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            # br is decoded by urllib3 when the brotli package is installed
+            'Accept-Encoding': 'gzip, deflate, br'
         }
+        self.session = requests_cache.CachedSession(
+            BILLBOARD_CACHE_PATH,
+            backend='sqlite',
+            expire_after=timedelta(days=1),
+            # Expiry is decided per request from the chart date (see get_chart);
+            # Billboard's Cache-Control/Expires headers would override it
+            cache_control=False
+        )
+        # Keep connections alive between fetches that miss the cache
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
     def get_chart(self, date=None):
-        """Scrape Billboard Hot 100 for given date"""
+        """Get Billboard Hot 100 for given date"""
         try:
             url = f"{self.base_url}/{date}" if date else self.base_url
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            songs = []
-            
-            # Try multiple selectors for different Billboard layouts
-            selectors = [
-                'li ul li h3',  # Old layout
-                'h3.c-title',   # New layout
-                '.chart-list__item h3',  # Alternative layout
-                '.o-chart-results-list__item h3'  # Another layout
-            ]
-            
-            song_elements = []
-            for selector in selectors:
-                song_elements = soup.select(selector)
-                if song_elements:
-                    break
-            
-            if not song_elements:
-                # Fallback: look for any h3 elements
-                song_elements = soup.find_all('h3')
-            
-            for i, element in enumerate(song_elements[:100]):  # Limit to 100
-                title = element.get_text().strip()
-                if title and len(title) > 1:  # Basic validation
-                    # Try to find artist info (usually in nearby elements)
-                    artist = "Unknown Artist"
-                    parent = element.parent
-                    if parent:
-                        # Look for artist in sibling elements
-                        siblings = parent.find_all(['p', 'span', 'div'])
-                        for sibling in siblings:
-                            text = sibling.get_text().strip()
-                            if text and text != title and len(text) < 100:
-                                artist = text
-                                break
-                    
-                    songs.append({
-                        'position': i + 1,
-                        'title': title,
-                        'artist': artist
-                    })
-            
-            return songs[:100]  # Ensure we return max 100
-            
+            # Past charts never change, so keep them indefinitely
+            today = datetime.now().strftime('%Y-%m-%d')
+            if date and date < today:
+                expire_after = requests_cache.NEVER_EXPIRE
+            else:
+                expire_after = timedelta(days=1)
+            # Key on the day so the memo rolls over with the HTTP cache
+            songs = _scrape_chart(self.session, url, expire_after, today)
+            return [dict(song) for song in songs]
         except Exception as e:
             print(f"Error scraping Billboard: {e}")
             return []
@@ -86,6 +252,42 @@ class BillboardScraper:
 class SpotifyService:
     def __init__(self):
         self.sp = None
+        self.access_token = None
+        self.user_id = None
+        self._local = threading.local()
+        # Shared by every service instance so the cache is opened only once
+        self.track_cache = track_cache
+    
+    def _new_client(self):
+        """Build a spotipy client for the current token"""
+        # spotipy's own session retries any 429 carrying Retry-After, sleeping
+        # uncapped and then raising without headers, so supply one that doesn't
+        retry = Retry(
+            total=MAX_RETRIES,
+            connect=None,
+            read=False,
+            allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+            status=MAX_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=SPOTIPY_RETRY_CODES,
+            respect_retry_after_header=False
+        )
+        http = requests.Session()
+        adapter = HTTPAdapter(max_retries=retry)
+        http.mount('https://', adapter)
+        http.mount('http://', adapter)
+        return spotipy.Spotify(auth=self.access_token, requests_session=http)
+    
+    def _client(self):
+        """Get a Spotify client for the current thread"""
+        # spotipy clients wrap a requests.Session, which isn't safe to share
+        # across threads, so each worker gets its own client for the token
+        client = getattr(self._local, 'client', None)
+        if client is None or getattr(self._local, 'token', None) != self.access_token:
+            client = self._new_client()
+            self._local.client = client
+            self._local.token = self.access_token
+        return client
     
     def get_auth_url(self):
         """Get Spotify authorization URL"""
@@ -98,6 +300,12 @@ class SpotifyService:
         )
         return sp_oauth.get_authorize_url()
     
+    def use_token(self, access_token, user_id=None):
+        """Use an existing access token, e.g. one handed to a background job"""
+        self.access_token = access_token
+        self.sp = self._new_client()
+        self.user_id = user_id
+    
     def authenticate(self, code):
         """Complete Spotify authentication"""
         try:
@@ -108,57 +316,154 @@ class SpotifyService:
                 scope='playlist-modify-public playlist-modify-private playlist-read-private'
             )
             token_info = sp_oauth.get_access_token(code)
-            self.sp = spotipy.Spotify(auth=token_info['access_token'])
+            self.use_token(token_info['access_token'])
             return token_info
         except Exception as e:
             print(f"Authentication error: {e}")
             return None
     
+    def _prepare_search(self, title, artist):
+        """Clean search terms and build their cache key and query strategies"""
+        title = _PUNCT_RE.sub('', title)
+        artist = _PUNCT_RE.sub('', artist)
+        
+        cache_key = hashlib.sha1(
+            f"{title.lower().strip()}|{artist.lower().strip()}".encode()
+        ).hexdigest()
+        
+        # Multiple search strategies, most specific first
+        queries = [
+            f'track:"{title}" artist:"{artist}"',
+            f'{title} {artist}',
+            f'track:{title} artist:{artist}'
+        ]
+        return title, artist, cache_key, queries
+    
+    def _best_match(self, title, artist, results, best):
+        """Score the returned search results and keep the best match so far"""
+        for track in results['tracks']['items']:
+            score = (
+                fuzz.token_set_ratio(title, track['name'], processor=default_process) +
+                fuzz.token_set_ratio(artist, track['artists'][0]['name'], processor=default_process)
+            )
+            if best is None or score > best[0]:
+                best = (score, track)
+        return best
+    
+    def _track_info(self, cache_key, best):
+        """Build and cache track info from the best match, if any"""
+        if best is None:
+            return None
+        score, track = best
+        track_info = {
+            'uri': track['uri'],
+            'name': track['name'],
+            'artist': track['artists'][0]['name'],
+            'popularity': track['popularity']
+        }
+        # Low-confidence matches expire soon so later runs search again
+        expire = TRACK_CACHE_TTL if score >= MATCH_THRESHOLD else WEAK_MATCH_CACHE_TTL
+        self.track_cache.set(cache_key, track_info, expire=expire)
+        return track_info
+    
+    def _match_track(self, title, artist):
+        """Search strategy shared by the sync and async paths
+        
+        A generator: it yields each query to run and is sent that query's
+        results, and returns the track info (or None) when done.
+        """
+        clean_title, clean_artist, cache_key, queries = self._prepare_search(title, artist)
+        cached = self.track_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Stop at the first confident match instead of trying every query
+        best = None
+        for query in queries:
+            results = yield query
+            best = self._best_match(clean_title, clean_artist, results, best)
+            if best and best[0] >= MATCH_THRESHOLD:
+                break
+        
+        return self._track_info(cache_key, best)
+    
     def search_track(self, title, artist):
         """Search for track on Spotify"""
         if not self.sp:
             return None
         
         try:
-            # Clean the search terms
-            title = re.sub(r'[^\w\s]', '', title)
-            artist = re.sub(r'[^\w\s]', '', artist)
-            
-            # Multiple search strategies
-            queries = [
-                f'track:"{title}" artist:"{artist}"',
-                f'"{title}" "{artist}"',
-                f'{title} {artist}',
-                f'track:{title} artist:{artist}'
-            ]
-            
-            for query in queries:
-                results = self.sp.search(q=query, type='track', limit=5)
-                if results['tracks']['items']:
-                    # Return the first result
-                    track = results['tracks']['items'][0]
-                    return {
-                        'uri': track['uri'],
-                        'name': track['name'],
-                        'artist': track['artists'][0]['name'],
-                        'popularity': track['popularity']
-                    }
-            
+            matcher = self._match_track(title, artist)
+            query = next(matcher)
+            while True:
+                results = retry_with_backoff(
+                    self._client().search, q=query, type='track', limit=5
+                )
+                query = matcher.send(results)
+        except StopIteration as done:
+            return done.value
+        except Exception as e:
+            print(f"Error searching for {title} by {artist}: {e}")
             return None
-            
+    
+    async def _get_with_backoff(self, http, semaphore, url, params):
+        """GET a Spotify API URL, retrying rate limits and server errors"""
+        # Retries the same statuses as the spotipy path so both agree on misses
+        for attempt in range(MAX_RETRIES + 1):
+            async with semaphore:
+                async with http.get(url, params=params) as response:
+                    retryable = response.status == 429 or response.status in SPOTIPY_RETRY_CODES
+                    if not retryable or attempt == MAX_RETRIES:
+                        response.raise_for_status()
+                        return await response.json()
+                    retry_after = response.headers.get('Retry-After') if response.status == 429 else None
+            # Sleep outside the semaphore so other searches can proceed
+            await asyncio.sleep(_retry_delay(retry_after, attempt))
+    
+    async def _search_track_async(self, http, semaphore, title, artist):
+        """Search for track on Spotify without blocking the event loop"""
+        try:
+            matcher = self._match_track(title, artist)
+            query = next(matcher)
+            while True:
+                results = await self._get_with_backoff(
+                    http, semaphore, SPOTIFY_SEARCH_URL,
+                    params={'q': query, 'type': 'track', 'limit': 5}
+                )
+                query = matcher.send(results)
+        except StopIteration as done:
+            return done.value
         except Exception as e:
             print(f"Error searching for {title} by {artist}: {e}")
             return None
     
+    async def _search_tracks_async(self, songs):
+        """Fan out searches for all songs over one aiohttp session"""
+        semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+        headers = {'Authorization': f'Bearer {self.access_token}'}
+        async with aiohttp.ClientSession(headers=headers) as http:
+            return await asyncio.gather(*[
+                self._search_track_async(http, semaphore, song['title'], song['artist'])
+                for song in songs
+            ])
+    
+    def search_tracks(self, songs):
+        """Search for many tracks concurrently, returning results in song order"""
+        if not self.sp:
+            return [None] * len(songs)
+        return asyncio.run(self._search_tracks_async(songs))
+    
     def create_playlist(self, name, description="", public=True):
         """Create Spotify playlist"""
         if not self.sp:
             return None
         
         try:
-            user_id = self.sp.current_user()['id']
+            # Usually handed in from the session; otherwise look it up once
+            if not self.user_id:
+                self.user_id = self.sp.current_user()['id']
             playlist = self.sp.user_playlist_create(
-                user=user_id,
+                user=self.user_id,
                 name=name,
                 description=description,
                 public=public
@@ -174,19 +479,25 @@ class SpotifyService:
             return False
         
         try:
-            # Add tracks in chunks of 100
+            # Add tracks in chunks of 100, in order so the chart ranking holds
             chunk_size = 100
             for i in range(0, len(track_uris), chunk_size):
                 chunk = track_uris[i:i + chunk_size]
-                self.sp.playlist_add_items(playlist_id, chunk)
+                retry_with_backoff(self.sp.playlist_add_items, playlist_id, chunk)
             return True
         except Exception as e:
             print(f"Error adding tracks: {e}")
             return False
 
+# Set when the Spotify callback stores a token; cleared when /auth starts a new sign-in
+AUTH_EVENT = threading.Event()
+
 # Initialize services
+track_cache = diskcache.Cache(TRACK_CACHE_DIR)
 billboard_scraper = BillboardScraper()
 spotify_service = SpotifyService()
+redis_conn = Redis.from_url(REDIS_URL)
+playlist_queue = Queue('playlists', connection=redis_conn)
 
 @app.route('/')
 def index():
@@ -197,16 +508,27 @@ def index():
             "callback": "/callback",
             "charts": "/api/charts",
             "create_playlist": "/api/create_playlist",
-            "status": "/api/status"
+            "create_playlist_status": "/api/create_playlist/status/<job_id>",
+            "create_playlist_stream": "/api/create_playlist/stream",
+            "status": "/api/status",
+            "auth_wait": "/api/auth/wait"
         }
     })
 
 @app.route('/auth')
 def auth():
     """Initiate Spotify authentication"""
+    # Make /api/auth/wait block until this sign-in's callback arrives
+    AUTH_EVENT.clear()
     auth_url = spotify_service.get_auth_url()
     return redirect(auth_url)
 
+def _remember_user(user_info):
+    """Cache the signed-in user's profile and id in the session"""
+    session['user_info'] = user_info
+    session['user_info_ts'] = time.time()
+    session['user_id'] = user_info['id']
+
 @app.route('/callback')
 def callback():
     """Handle Spotify authentication callback"""
@@ -215,6 +537,17 @@ def callback():
         token_info = spotify_service.authenticate(code)
         if token_info:
             session['token_info'] = token_info
+            # New token, so drop any profile cached for the old one
+            session.pop('user_info', None)
+            session.pop('user_info_ts', None)
+            session.pop('user_id', None)
+            # Look the profile up once now so /api/status and playlist builds
+            # can reuse it; if this fails they'll fetch it when needed
+            try:
+                _remember_user(spotify_service.sp.current_user())
+            except Exception as e:
+                print(f"Error fetching Spotify profile: {e}")
+            AUTH_EVENT.set()
             return jsonify({"status": "success", "message": "Authentication successful"})
     
     return jsonify({"status": "error", "message": "Authentication failed"}), 400
@@ -242,34 +575,44 @@ def get_charts():
         "songs": songs
     })
 
-@app.route('/api/create_playlist', methods=['POST'])
-def create_playlist():
-    """Create Spotify playlist from Billboard chart"""
-    if 'token_info' not in session:
-        return jsonify({"error": "Not authenticated with Spotify"}), 401
-    
-    data = request.get_json()
-    date = data.get('date')
-    playlist_name = data.get('playlist_name')
-    public = data.get('public', True)
-    
+def dedupe_songs(songs):
+    """Drop repeated (title, artist) pairs, keeping the first chart entry"""
+    seen = set()
+    unique = []
+    for song in songs:
+        key = (
+            _PUNCT_RE.sub('', song['title'].lower()).strip(),
+            _PUNCT_RE.sub('', song['artist'].lower()).strip()
+        )
+        if key not in seen:
+            seen.add(key)
+            unique.append(song)
+    return unique
+
+def build_playlist(spotify, date=None, playlist_name=None, public=True):
+    """Build a Spotify playlist from a Billboard chart, returning (body, status code)"""
     # Get Billboard chart
     songs = billboard_scraper.get_chart(date)
     if not songs:
-        return jsonify({"error": "Failed to fetch Billboard chart"}), 500
+        return {"error": "Failed to fetch Billboard chart"}, 500
+    songs = dedupe_songs(songs)
     
+    results = spotify.search_tracks(songs)
+    return finish_playlist(spotify, date, playlist_name, public, songs, results)
+
+def finish_playlist(spotify, date, playlist_name, public, songs, results):
+    """Create the playlist from search results, returning (body, status code)"""
     # Create playlist name if not provided
     if not playlist_name:
         chart_date = date if date else datetime.now().strftime("%Y-%m-%d")
         playlist_name = f"Billboard Hot 100 - {chart_date}"
     
-    # Search for tracks on Spotify
+    # Search results come in chart order, one per song
     found_tracks = []
     missing_tracks = []
     track_uris = []
     
-    for song in songs:
-        track_info = spotify_service.search_track(song['title'], song['artist'])
+    for song, track_info in zip(songs, results):
         if track_info:
             track_uris.append(track_info['uri'])
             found_tracks.append({
@@ -279,23 +622,20 @@ def create_playlist():
             })
         else:
             missing_tracks.append(song)
-        
-        # Small delay to avoid rate limiting
-        time.sleep(0.1)
     
     # Create Spotify playlist
     description = f"Billboard Hot 100 chart from {date or 'current week'}. Created with Spotify Billboard Bridge."
-    playlist = spotify_service.create_playlist(playlist_name, description, public)
+    playlist = spotify.create_playlist(playlist_name, description, public)
     
     if not playlist:
-        return jsonify({"error": "Failed to create Spotify playlist"}), 500
+        return {"error": "Failed to create Spotify playlist"}, 500
     
     # Add tracks to playlist
     success = False
     if track_uris:
-        success = spotify_service.add_tracks_to_playlist(playlist['id'], track_uris)
+        success = spotify.add_tracks_to_playlist(playlist['id'], track_uris)
     
-    return jsonify({
+    return {
         "status": "success" if success else "partial_success",
         "playlist": {
             "id": playlist['id'],
@@ -309,7 +649,124 @@ def create_playlist():
         },
         "found_tracks": found_tracks,
         "missing_tracks": missing_tracks
-    })
+    }, 200
+
+def build_playlist_task(date, playlist_name, public, access_token, user_id=None):
+    """Background job: build a playlist with the requesting user's token"""
+    spotify = SpotifyService()
+    spotify.use_token(access_token, user_id)
+    result, _ = build_playlist(spotify, date, playlist_name, public)
+    return result
+
+@app.route('/api/create_playlist', methods=['POST'])
+def create_playlist():
+    """Queue a Spotify playlist build from Billboard chart"""
+    if 'token_info' not in session:
+        return jsonify({"error": "Not authenticated with Spotify"}), 401
+    
+    data = request.get_json()
+    try:
+        # Enqueue by import path: the worker can't resolve functions in __main__.
+        # Only the short-lived access token is stored with the job, never the
+        # refresh token, and the job is removed once its TTLs run out
+        job = playlist_queue.enqueue(
+            'app.build_playlist_task',
+            data.get('date'),
+            data.get('playlist_name'),
+            data.get('public', True),
+            session['token_info']['access_token'],
+            session.get('user_id'),
+            ttl=PLAYLIST_JOB_TIMEOUT,
+            job_timeout=PLAYLIST_JOB_TIMEOUT,
+            result_ttl=PLAYLIST_RESULT_TTL,
+            failure_ttl=PLAYLIST_RESULT_TTL
+        )
+    except RedisError as e:
+        print(f"Error queueing playlist build: {e}")
+        return jsonify({"error": "Playlist queue unavailable"}), 500
+    
+    return jsonify({
+        "job_id": job.id,
+        "status_url": url_for('create_playlist_status', job_id=job.id)
+    }), 202
+
+@app.route('/api/create_playlist/status/<job_id>')
+def create_playlist_status(job_id):
+    """Check the progress of a queued playlist build"""
+    try:
+        job = Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        return jsonify({"error": "Unknown job"}), 404
+    except RedisError as e:
+        print(f"Error fetching playlist job: {e}")
+        return jsonify({"error": "Playlist queue unavailable"}), 500
+    
+    job_status = job.get_status()
+    response = {"job_id": job.id, "status": job_status}
+    if job_status == 'finished':
+        response["result"] = job.result
+    elif job_status == 'failed':
+        response["error"] = "Playlist build failed"
+    
+    return jsonify(response)
+
+def _sse(event):
+    """Format an event as a Server-Sent Events message"""
+    return f"data: {app.json.dumps(event)}\n\n"
+
+# POST with a JSON body, since this creates a playlist: other sites can't send
+# one with the user's cookie, as that needs a credentialed CORS preflight and
+# CORS here doesn't allow credentials
+@app.route('/api/create_playlist/stream', methods=['POST'])
+def create_playlist_stream():
+    """Create Spotify playlist from Billboard chart, streaming progress as SSE"""
+    if 'token_info' not in session:
+        return jsonify({"error": "Not authenticated with Spotify"}), 401
+    
+    data = request.get_json()
+    date = data.get('date')
+    playlist_name = data.get('playlist_name')
+    public = data.get('public', True)
+    
+    spotify = SpotifyService()
+    spotify.use_token(session['token_info']['access_token'], session.get('user_id'))
+    
+    def generate():
+        songs = billboard_scraper.get_chart(date)
+        if not songs:
+            yield _sse({"type": "error", "error": "Failed to fetch Billboard chart"})
+            return
+        songs = dedupe_songs(songs)
+        yield _sse({"type": "chart", "total_songs": len(songs)})
+        
+        # Report each song as soon as its search finishes
+        results = [None] * len(songs)
+        with ThreadPoolExecutor(max_workers=SEARCH_CONCURRENCY) as executor:
+            futures = {
+                executor.submit(spotify.search_track, song['title'], song['artist']): i
+                for i, song in enumerate(songs)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                song = songs[i]
+                if results[i]:
+                    yield _sse({
+                        "type": "found",
+                        **song,
+                        'spotify_name': results[i]['name'],
+                        'spotify_artist': results[i]['artist']
+                    })
+                else:
+                    yield _sse({"type": "missing", **song})
+        
+        body, status_code = finish_playlist(spotify, date, playlist_name, public, songs, results)
+        if status_code != 200:
+            yield _sse({"type": "error", **body})
+        else:
+            yield _sse({"type": "done", **body})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
 @app.route('/api/status')
 def status():
@@ -318,16 +775,33 @@ def status():
     user_info = None
     
     if authenticated and spotify_service.sp:
-        try:
-            user_info = spotify_service.sp.current_user()
-        except:
-            authenticated = False
+        # Reuse the recent profile lookup; the CLI polls this endpoint
+        cached_at = session.get('user_info_ts', 0)
+        if 'user_info' in session and time.time() - cached_at < USER_INFO_TTL:
+            user_info = session['user_info']
+        else:
+            try:
+                user_info = spotify_service.sp.current_user()
+                _remember_user(user_info)
+            except:
+                authenticated = False
     
     return jsonify({
         "authenticated": authenticated,
         "user": user_info
     })
 
+@app.route('/api/auth/wait')
+def auth_wait():
+    """Long-poll until authentication completes, then return status"""
+    try:
+        timeout = int(request.args.get('timeout', 30))
+    except ValueError:
+        return jsonify({"error": "Invalid timeout"}), 400
+    
+    AUTH_EVENT.wait(timeout=min(max(timeout, 0), AUTH_WAIT_MAX))
+    return status()
+
 @app.route('/api/search_track')
 def search_track():
     """Search for a specific track"""
@@ -347,6 +821,12 @@ def search_track():
     else:
         return jsonify({"status": "not_found"})
 
+def warm_chart_cache():
+    """Fetch the current chart in the background so the first request hits the cache"""
+    thread = threading.Thread(target=billboard_scraper.get_chart, daemon=True)
+    thread.start()
+    return thread
+
 if __name__ == '__main__':
     print("Starting Spotify Billboard Bridge API...")
     print("Make sure to set your environment variables:")
@@ -354,5 +834,11 @@ if __name__ == '__main__':
     print("- SPOTIFY_CLIENT_SECRET")
     print("- SPOTIFY_REDIRECT_URI (optional, defaults to http://localhost:5000/callback)")
     print("- FLASK_SECRET_KEY (optional)")
+    print("- REDIS_URL (optional, defaults to redis://localhost:6379/0)")
+    print("Playlists are built by a background worker: rq worker playlists")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    debug = True
+    # With the reloader, only the child process serves requests, so only warm there
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_chart_cache()
+    app.run(debug=debug, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -4,9 +4,11 @@ CLI client for Spotify Billboard Bridge API
 """
 import requests
 import webbrowser
+import json
 import time
 import sys
 from datetime import datetime
+from tqdm import tqdm
 
 class SpotifyBillboardCLI:
     def __init__(self, base_url="http://localhost:5000"):
@@ -40,10 +42,19 @@ class SpotifyBillboardCLI:
         
         # Wait for authentication
         print("⏳ Waiting for authentication... (check your browser)")
-        for i in range(60):  # Wait up to 60 seconds
-            time.sleep(1)
+        deadline = time.time() + 60  # Wait up to 60 seconds
+        delays = [1, 2, 3, 5]  # Back off when the wait returns early
+        attempt = 0
+        next_notice = time.time() + 10
+        while time.time() < deadline:
+            remaining = int(deadline - time.time())
             try:
-                response = self.session.get(f"{self.base_url}/api/status")
+                # The server holds this request open until the callback arrives
+                response = self.session.get(
+                    f"{self.base_url}/api/auth/wait",
+                    params={'timeout': min(30, max(remaining, 1))},
+                    timeout=35
+                )
                 if response.json().get('authenticated'):
                     user = response.json().get('user', {})
                     print(f"✅ Successfully authenticated as {user.get('display_name', 'User')}")
@@ -51,8 +62,16 @@ class SpotifyBillboardCLI:
             except:
                 pass
             
-            if i % 10 == 0:
-                print(f"⏳ Still waiting... ({60-i}s remaining)")
+            # The wait can return early without this session being signed in
+            # (e.g. the callback has fired), so don't hammer the server
+            delay = delays[min(attempt, len(delays) - 1)]
+            attempt += 1
+            time.sleep(max(0, min(delay, deadline - time.time())))
+            
+            remaining = int(deadline - time.time())
+            if remaining > 0 and time.time() >= next_notice:
+                print(f"⏳ Still waiting... ({remaining}s remaining)")
+                next_notice = time.time() + 10
         
         print("❌ Authentication timeout. Please try again.")
         return False
@@ -69,10 +88,13 @@ class SpotifyBillboardCLI:
             print(f"❌ Error fetching chart: {e}")
             return None
     
-    def create_playlist(self, date=None, playlist_name=None, public=True):
+    def create_playlist(self, date=None, playlist_name=None, public=True, stream=True):
         """Create Spotify playlist from Billboard chart"""
         print(f"🎵 Creating playlist for {date or 'current'} Billboard Hot 100...")
         
+        if stream:
+            return self.stream_playlist(date, playlist_name, public)
+        
         url = f"{self.base_url}/api/create_playlist"
         data = {
             'date': date,
@@ -84,29 +106,98 @@ class SpotifyBillboardCLI:
             response = self.session.post(url, json=data)
             result = response.json()
             
-            if response.status_code == 200:
-                stats = result['stats']
-                playlist = result['playlist']
-                
-                print(f"✅ Successfully created playlist: {playlist['name']}")
-                print(f"🔗 Playlist URL: {playlist['url']}")
-                print(f"📊 Stats: {stats['found']}/{stats['total_songs']} tracks found")
-                
-                if result['missing_tracks']:
-                    print(f"\n❌ Missing tracks ({len(result['missing_tracks'])}):")
-                    for track in result['missing_tracks'][:10]:
-                        print(f"   • {track['title']} - {track['artist']}")
-                    if len(result['missing_tracks']) > 10:
-                        print(f"   ... and {len(result['missing_tracks']) - 10} more")
+            if response.status_code == 202:
+                result = self.wait_for_playlist(result['job_id'])
+                if result is None:
+                    return False
+            
+            return self.show_playlist_result(result)
                 
-                return True
-            else:
-                print(f"❌ Error: {result.get('error', 'Unknown error')}")
-                return False
+        except Exception as e:
+            print(f"❌ Error creating playlist: {e}")
+            return False
+    
+    def stream_playlist(self, date=None, playlist_name=None, public=True):
+        """Create playlist, showing progress as tracks are matched"""
+        url = f"{self.base_url}/api/create_playlist/stream"
+        data = {
+            'date': date,
+            'playlist_name': playlist_name,
+            'public': public
+        }
+        
+        progress = None
+        try:
+            with self.session.post(url, json=data, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"❌ Error: {response.json().get('error', 'Unknown error')}")
+                    return False
                 
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data: '):
+                        continue
+                    event = json.loads(line[len('data: '):])
+                    
+                    if event['type'] == 'chart':
+                        progress = tqdm(total=event['total_songs'], desc="🔍 Matching tracks", unit="song")
+                    elif event['type'] in ('found', 'missing'):
+                        if progress:
+                            progress.update(1)
+                    else:
+                        if progress:
+                            progress.close()
+                            progress = None
+                        return self.show_playlist_result(event)
+            
+            print("❌ Error: Connection closed before playlist was created")
+            return False
+            
         except Exception as e:
             print(f"❌ Error creating playlist: {e}")
             return False
+        finally:
+            if progress:
+                progress.close()
+    
+    def show_playlist_result(self, result):
+        """Print a playlist build result"""
+        if 'playlist' in result:
+            stats = result['stats']
+            playlist = result['playlist']
+            
+            print(f"✅ Successfully created playlist: {playlist['name']}")
+            print(f"🔗 Playlist URL: {playlist['url']}")
+            print(f"📊 Stats: {stats['found']}/{stats['total_songs']} tracks found")
+            
+            if result['missing_tracks']:
+                print(f"\n❌ Missing tracks ({len(result['missing_tracks'])}):")
+                for track in result['missing_tracks'][:10]:
+                    print(f"   • {track['title']} - {track['artist']}")
+                if len(result['missing_tracks']) > 10:
+                    print(f"   ... and {len(result['missing_tracks']) - 10} more")
+            
+            return True
+        else:
+            print(f"❌ Error: {result.get('error', 'Unknown error')}")
+            return False
+    
+    def wait_for_playlist(self, job_id, timeout=600):
+        """Poll a queued playlist build until it finishes"""
+        url = f"{self.base_url}/api/create_playlist/status/{job_id}"
+        print("⏳ Building playlist...")
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = self.session.get(url)
+            job = response.json()
+            if job.get('status') == 'finished':
+                return job['result']
+            if job.get('status') == 'failed' or response.status_code != 200:
+                print(f"❌ Error: {job.get('error', 'Unknown error')}")
+                return None
+            time.sleep(1)
+        
+        print("❌ Timed out waiting for playlist to be built.")
+        return None
     
     def interactive_mode(self):
         """Interactive CLI mode"""